@@ -1,20 +1,50 @@
+import hashlib
+import math
 import os
+import queue
 import sqlite3
-import statistics
-from datetime import datetime, timezone
-from typing import Any, Dict, List
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
-from flask import Flask, jsonify, send_from_directory
+import orjson
+from flask import Flask, Response, request
 from flask_cors import CORS
 
+from schema import init_db
+
 DB_PATH = os.getenv("DONUTSMP_DB_PATH", os.path.join(os.path.dirname(__file__), "donutsmpah.db"))
+POOL_SIZE = int(os.getenv("DONUTSMP_POOL_SIZE", "8"))
+CACHE_TTL = int(os.getenv("DONUTSMP_CACHE_TTL", "60"))
+ROLLUP_INTERVAL = int(os.getenv("DONUTSMP_ROLLUP_INTERVAL", "60"))
+ROLLUP_WINDOW_HOURS = int(os.getenv("DONUTSMP_ROLLUP_WINDOW_HOURS", "24"))
+CHECKPOINT_INTERVAL = int(os.getenv("DONUTSMP_CHECKPOINT_INTERVAL", "300"))
+CHECKPOINT_IDLE = 2  # quiet gap required; the dashboard polls every 5s
+
+_POOL: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=POOL_SIZE)
+# Computed dashboard payloads: name -> (computed_at, data version, data)
+_CACHE: Dict[str, Tuple[float, tuple, Any]] = {}
 
 app = Flask(__name__)
 CORS(app)
 
 
+_last_request_at = 0.0
+
+
+@app.before_request
+def mark_request():
+    global _last_request_at
+    _last_request_at = time.monotonic()
+
+
 @app.after_request
 def add_header(response):
+    if request.endpoint in ("index", "app_js"):
+        # Static assets carry an ETag; let the browser revalidate and get a 304
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
@@ -25,471 +55,606 @@ def _init_db() -> None:
     """Initialize database tables if they don't exist"""
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
+    # page_size only takes effect on a fresh database (existing files need a VACUUM)
+    cur.execute("PRAGMA page_size=8192")
+    # Shared tables (and WAL mode) come from schema.py so the two cannot drift apart
+    init_db(conn)
+    cur.execute("BEGIN")
+    try:
+        _create_api_objects(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _init_stats_cache(conn)
+    # Refresh planner statistics; analysis_limit keeps this cheap on large tables
+    cur.execute("PRAGMA analysis_limit=1000")
+    cur.execute("ANALYZE")
+    conn.close()
+
+
+def _create_api_objects(cur: sqlite3.Cursor) -> None:
+    """Read-path indexes and derived tables that only the API needs"""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rollups_item_date ON rollups_daily(item_id, date)")
+    # Covering index for per-item listing scans (price/ts read from index leaves)
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS listings (
-            id TEXT PRIMARY KEY,
-            item_id TEXT,
-            item_name TEXT,
-            count INTEGER,
-            price REAL,
-            seller_name TEXT,
-            seller_uuid TEXT,
-            time_left INTEGER,
-            seen_at INTEGER
-        )
+        CREATE INDEX IF NOT EXISTS idx_events_listing_cover
+        ON events(type, item_id, item_name, price, ts) WHERE type = 'listing'
         """
     )
+    # Covering index for the rollups_recent window: a range seek on ts reads only
+    # the recent listings instead of every listing the covering index above holds
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS prices (
-            id TEXT,
-            item_id TEXT,
-            item_name TEXT,
-            price REAL,
-            seen_at INTEGER
-        )
+        CREATE INDEX IF NOT EXISTS idx_events_listing_ts
+        ON events(type, ts, item_id, item_name, price) WHERE type = 'listing'
         """
     )
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS transactions (
-            unixMillisDateSold INTEGER,
+        CREATE TABLE IF NOT EXISTS rollups_recent (
             item_id TEXT,
             item_name TEXT,
-            price REAL,
-            seller_name TEXT,
-            seller_uuid TEXT
+            listing_count INTEGER,
+            sample_size INTEGER,
+            median REAL,
+            q1 REAL,
+            q3 REAL,
+            mean REAL,
+            variance REAL,
+            min REAL,
+            max REAL,
+            updated_at INTEGER,
+            PRIMARY KEY (item_id, item_name)
         )
         """
     )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT,
-            ts INTEGER,
-            item_id TEXT,
-            item_name TEXT,
-            price REAL,
-            seller_name TEXT,
-            seller_uuid TEXT,
-            count INTEGER,
-            time_left INTEGER
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rollups_recent_count ON rollups_recent(listing_count)")
+
+
+def _init_stats_cache(conn: sqlite3.Connection) -> None:
+    """Create the trigger-maintained counters behind /api/stats, seeding them once"""
+    cur = conn.cursor()
+    if cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_cache'").fetchone():
+        return
+    # One write transaction so no scanner insert lands between seeding and the triggers
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("CREATE TABLE stats_cache (key TEXT PRIMARY KEY, value INTEGER)")
+        cur.execute("CREATE TABLE IF NOT EXISTS seen_items (item_id TEXT PRIMARY KEY)")
+        cur.execute("INSERT OR IGNORE INTO seen_items (item_id) SELECT DISTINCT item_id FROM events WHERE item_id != ''")
+        cur.execute(
+            """
+            INSERT INTO stats_cache (key, value)
+            SELECT 'total_events', COUNT(*) FROM events
+            UNION ALL SELECT 'total_listings', COUNT(*) FROM events WHERE type = 'listing'
+            UNION ALL SELECT 'total_transactions', COUNT(*) FROM events WHERE type = 'transaction'
+            UNION ALL SELECT 'min_ts', MIN(ts) FROM events
+            UNION ALL SELECT 'max_ts', MAX(ts) FROM events
+            UNION ALL SELECT 'unique_items', COUNT(*) FROM seen_items
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS rollups_daily (
-            date TEXT,
-            item_id TEXT,
-            item_name TEXT,
-            median REAL,
-            p25 REAL,
-            p75 REAL,
-            count INTEGER,
-            PRIMARY KEY (date, item_id, item_name)
+        cur.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_events_stats_insert AFTER INSERT ON events
+            BEGIN
+                UPDATE stats_cache SET value = value + 1
+                WHERE key IN ('total_events', CASE NEW.type WHEN 'listing' THEN 'total_listings'
+                                                            WHEN 'transaction' THEN 'total_transactions' END);
+                UPDATE stats_cache SET value = MIN(COALESCE(value, NEW.ts), NEW.ts)
+                WHERE key = 'min_ts' AND NEW.ts IS NOT NULL;
+                UPDATE stats_cache SET value = MAX(COALESCE(value, NEW.ts), NEW.ts)
+                WHERE key = 'max_ts' AND NEW.ts IS NOT NULL;
+                INSERT OR IGNORE INTO seen_items (item_id) SELECT NEW.item_id WHERE NEW.item_id != '';
+            END
+            """
         )
-        """
-    )
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_item ON events(item_id, item_name)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_rollups_item ON rollups_daily(item_id, item_name)")
-    conn.commit()
-    conn.close()
+        cur.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_events_stats_delete AFTER DELETE ON events
+            BEGIN
+                UPDATE stats_cache SET value = value - 1
+                WHERE key IN ('total_events', CASE OLD.type WHEN 'listing' THEN 'total_listings'
+                                                            WHEN 'transaction' THEN 'total_transactions' END);
+                UPDATE stats_cache SET value = (SELECT MIN(ts) FROM events)
+                WHERE key = 'min_ts' AND value = OLD.ts;
+                UPDATE stats_cache SET value = (SELECT MAX(ts) FROM events)
+                WHERE key = 'max_ts' AND value = OLD.ts;
+                DELETE FROM seen_items
+                WHERE item_id = OLD.item_id AND NOT EXISTS (SELECT 1 FROM events WHERE item_id = OLD.item_id);
+            END
+            """
+        )
+        cur.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_seen_items_insert AFTER INSERT ON seen_items
+            BEGIN
+                UPDATE stats_cache SET value = value + 1 WHERE key = 'unique_items';
+            END
+            """
+        )
+        cur.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_seen_items_delete AFTER DELETE ON seen_items
+            BEGIN
+                UPDATE stats_cache SET value = value - 1 WHERE key = 'unique_items';
+            END
+            """
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 _init_db()
 
 
-def _get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-131072")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA wal_autocheckpoint=10000")
+    try:
+        conn.execute("SELECT sqrt(1)")
+    except sqlite3.OperationalError:
+        # SQLite builds without SQLITE_ENABLE_MATH_FUNCTIONS lack sqrt()
+        conn.create_function("sqrt", 1, math.sqrt, deterministic=True)
     return conn
 
 
+@contextmanager
+def _acquire() -> Iterator[sqlite3.Connection]:
+    """Borrow a long-lived pooled connection so its page cache stays warm"""
+    try:
+        conn = _POOL.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+    finally:
+        try:
+            _POOL.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
 def _now_millis() -> int:
-    return int(datetime.now(timezone.utc).timestamp() * 1000)
+    return time.time_ns() // 1_000_000
+
+
+def _json(obj: Any, status: int = 200) -> Response:
+    return Response(orjson.dumps(obj), status=status, mimetype="application/json")
+
+
+def _load_static(filename: str) -> Tuple[bytes, str]:
+    with open(os.path.join(os.path.dirname(__file__), filename), "rb") as f:
+        body = f.read()
+    return body, hashlib.md5(body).hexdigest()
+
+
+# Dashboard assets are read once at startup; restart the server to pick up edits
+_HTML, _HTML_ETAG = _load_static("dashboard.html")
+_APP_JS, _APP_JS_ETAG = _load_static("app.js")
+
+
+def _static_response(body: bytes, etag: str, mimetype: str) -> Response:
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.route("/")
 def index():
-    return send_from_directory(os.path.dirname(__file__), "dashboard.html")
+    return _static_response(_HTML, _HTML_ETAG, "text/html")
 
 
 @app.route("/app.js")
 def app_js():
-    return send_from_directory(os.path.dirname(__file__), "app.js")
+    return _static_response(_APP_JS, _APP_JS_ETAG, "application/javascript")
+
+
+# Listings still on the auction house: re-polls refresh last_seen, not ts. The unary
+# + keeps the planner on idx_events_last_seen instead of scanning every listing by type.
+_SQL_LIVE = """
+    SELECT ts, item_id, item_name, price, seller_name, count, time_left
+    FROM events
+    WHERE last_seen > ? AND +type = 'listing'
+    ORDER BY last_seen DESC
+    LIMIT 100
+"""
 
 
 @app.route("/api/live")
 def api_live():
     """Recent listings from events table (last 5 minutes)"""
-    conn = _get_conn()
+    with _acquire() as conn:
+        cur = conn.cursor()
+        cutoff = _now_millis() - (5 * 60 * 1000)
+        try:
+            cur.execute(_SQL_LIVE, (cutoff,))
+            data = [dict(row) for row in cur.fetchall()]
+            return _json({"status": "ok", "data": data})
+        except Exception as e:
+            return _json({"status": "error", "message": str(e)}, 500)
+
+
+# Per-item price stats in a single statement: priced listings seen since :since
+# (latest 1000 per item), linearly interpolated quartiles, then median/mean/variance
+# over the 1.5*IQR-filtered prices. INDEXED BY keeps the ts bound a range seek on
+# idx_events_listing_ts (the planner prefers the item-ordered covering index and
+# would walk every listing), and CROSS JOIN keeps those rows as the outer loop.
+# Materialized into rollups_recent.
+_ITEM_STATS_CTE = """
+    WITH candidates AS (
+        SELECT item_id, item_name, COUNT(*) AS cnt
+        FROM events INDEXED BY idx_events_listing_ts
+        WHERE type = 'listing' AND price IS NOT NULL AND ts >= :since
+        GROUP BY item_id, item_name
+        HAVING cnt >= :min_count
+        ORDER BY cnt DESC
+        LIMIT :items
+    ),
+    recent AS (
+        SELECT e.item_id, e.item_name, e.price, MIN(c.cnt, 1000) AS n,
+               ROW_NUMBER() OVER (PARTITION BY e.item_id, e.item_name ORDER BY e.ts DESC) AS age
+        FROM events e INDEXED BY idx_events_listing_ts
+        CROSS JOIN candidates c ON e.item_id = c.item_id AND e.item_name = c.item_name
+        WHERE e.type = 'listing' AND e.price IS NOT NULL AND e.ts >= :since AND c.cnt >= 3
+    ),
+    ranked AS (
+        SELECT item_id, item_name, price, n,
+               ROW_NUMBER() OVER w AS rn,
+               NTH_VALUE(price, (n - 1) / 4 + 1) OVER w AS q1_lo,
+               NTH_VALUE(price, (n - 1) / 4 + 2) OVER w AS q1_hi,
+               NTH_VALUE(price, 3 * (n - 1) / 4 + 1) OVER w AS q3_lo,
+               NTH_VALUE(price, 3 * (n - 1) / 4 + 2) OVER w AS q3_hi
+        FROM recent
+        WHERE age <= 1000
+        WINDOW w AS (PARTITION BY item_id, item_name ORDER BY price
+                     ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+    ),
+    quartiles AS (
+        SELECT item_id, item_name, price, n, rn,
+               q1_lo + ((n - 1) % 4) * 0.25 * (q1_hi - q1_lo) AS q1,
+               q3_lo + ((3 * (n - 1)) % 4) * 0.25 * (q3_hi - q3_lo) AS q3
+        FROM ranked
+    ),
+    filtered AS (
+        SELECT item_id, item_name, price, n, q1, q3, rn,
+               MIN(rn) OVER w AS lo,
+               COUNT(*) OVER w AS fn,
+               AVG(price) OVER w AS mean
+        FROM quartiles
+        WHERE q3 <= q1
+           OR price BETWEEN MAX(0, q1 - 1.5 * (q3 - q1)) AND q3 + 1.5 * (q3 - q1)
+        WINDOW w AS (PARTITION BY item_id, item_name)
+    ),
+    stats AS (
+        SELECT item_id, item_name, n AS sample_size, q1, q3,
+               AVG(CASE WHEN rn - lo IN ((fn - 1) / 2, fn / 2) THEN price END) AS median,
+               AVG(price) AS mean,
+               MIN(price) AS min,
+               MAX(price) AS max,
+               CASE WHEN fn > 1
+                    THEN SUM((price - mean) * (price - mean)) / (fn - 1)
+                    ELSE 0 END AS variance
+        FROM filtered
+        GROUP BY item_id, item_name
+    )
+"""
+
+
+_SQL_ROLLUPS_RECENT = (
+    _ITEM_STATS_CTE
+    + """
+    SELECT s.item_id, s.item_name, c.cnt, s.sample_size, s.median,
+           s.q1, s.q3, s.mean, s.variance, s.min, s.max
+    FROM stats s
+    JOIN candidates c ON s.item_id = c.item_id AND s.item_name = c.item_name
+    """
+)
+_SQL_INSERT_ROLLUP_RECENT = """
+    INSERT INTO rollups_recent (item_id, item_name, listing_count, sample_size, median,
+                                q1, q3, mean, variance, min, max, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_EVENTS_VERSION = "SELECT value FROM stats_cache WHERE key IN ('total_events', 'max_ts') ORDER BY key"
+_SQL_DATA_VERSION = (
+    "SELECT value FROM stats_cache WHERE key IN ('total_events', 'max_ts', 'rollups_refreshed_at') ORDER BY key"
+)
+
+
+def _refresh_rollups_recent(conn: sqlite3.Connection) -> None:
+    """Rebuild rollups_recent from the last ROLLUP_WINDOW_HOURS of listings"""
     cur = conn.cursor()
-    cutoff = _now_millis() - (5 * 60 * 1000)
+    now = _now_millis()
+    since = now - ROLLUP_WINDOW_HOURS * 60 * 60 * 1000
+    # Rank prices under a plain read snapshot; the write lock is only taken for the
+    # small per-item swap below, so scanner inserts never wait on the window query
+    cur.execute(_SQL_ROLLUPS_RECENT, {"since": since, "min_count": 1, "items": -1})
+    rows = [tuple(row) + (now,) for row in cur.fetchall()]
+    cur.execute("BEGIN IMMEDIATE")
     try:
-        cur.execute(
-            """
-            SELECT ts, item_id, item_name, price, seller_name, count, time_left
-            FROM events
-            WHERE ts > ? AND type = 'listing'
-            ORDER BY ts DESC
-            LIMIT 100
-            """,
-            (cutoff,),
-        )
-        rows = cur.fetchall()
-        conn.close()
-        data = []
-        for row in rows:
-            data.append({
-                "ts": row[0],
-                "item_id": row[1],
-                "item_name": row[2],
-                "price": row[3],
-                "seller_name": row[4],
-                "count": row[5],
-                "time_left": row[6]
-            })
-        return jsonify({"status": "ok", "data": data})
-    except Exception as e:
-        conn.close()
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-
-def _get_item_stats(cur, item_id: str, item_name: str) -> Dict[str, Any]:
-    """Calculate comprehensive stats for an item"""
-    cur.execute(
-        """
-        SELECT price FROM events 
-        WHERE item_id = ? AND item_name = ? AND type = 'listing' AND price IS NOT NULL
-        ORDER BY ts DESC
-        LIMIT 1000
-        """,
-        (item_id, item_name),
+        cur.execute("DELETE FROM rollups_recent")
+        cur.executemany(_SQL_INSERT_ROLLUP_RECENT, rows)
+        cur.execute("INSERT OR REPLACE INTO stats_cache (key, value) VALUES ('rollups_refreshed_at', ?)", (now,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _rollup_worker() -> None:
+    """Keep rollups_recent fresh so request handlers never rank raw prices"""
+    last_version = None
+    while True:
+        try:
+            with _acquire() as conn:
+                cur = conn.cursor()
+                cur.execute(_SQL_EVENTS_VERSION)
+                version = tuple(row[0] for row in cur.fetchall())
+                if version != last_version:
+                    _refresh_rollups_recent(conn)
+                    last_version = version
+        except Exception as e:
+            print(f"[WARN] rollups_recent refresh failed: {e}")
+        time.sleep(ROLLUP_INTERVAL)
+
+
+def _checkpoint_worker() -> None:
+    """Truncate the WAL while the dashboard is idle so it cannot grow unbounded"""
+    while True:
+        time.sleep(CHECKPOINT_INTERVAL)
+        while time.monotonic() - _last_request_at < CHECKPOINT_IDLE:
+            time.sleep(1)
+        try:
+            with _acquire() as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception as e:
+            print(f"[WARN] WAL checkpoint failed: {e}")
+
+
+threading.Thread(target=_rollup_worker, name="rollups-recent", daemon=True).start()
+threading.Thread(target=_checkpoint_worker, name="wal-checkpoint", daemon=True).start()
+
+
+def _data_version(cur) -> tuple:
+    """Changes whenever events are written or rollups_recent is refreshed"""
+    cur.execute(_SQL_DATA_VERSION)
+    return tuple(row[0] for row in cur.fetchall())
+
+
+def _cached(name: str, conn: sqlite3.Connection, loader: Callable[[sqlite3.Cursor], Any]) -> Any:
+    """Return loader(cur), reusing the previous result for up to CACHE_TTL seconds
+    as long as no events have been written since it was computed."""
+    cur = conn.cursor()
+    version = _data_version(cur)
+    hit = _CACHE.get(name)
+    if hit and hit[1] == version and time.monotonic() - hit[0] < CACHE_TTL:
+        return hit[2]
+    data = loader(cur)
+    _CACHE[name] = (time.monotonic(), version, data)
+    return data
+
+
+# Coefficient of variation (%) of a rollups_recent row
+_SQL_VOLATILITY = "CASE WHEN mean > 0 THEN sqrt(MAX(variance, 0)) / mean * 100 ELSE 0 END"
+
+_SQL_RECOMMENDATIONS = f"""
+    WITH stats AS (
+        SELECT item_id, item_name, sample_size, median, {_SQL_VOLATILITY} AS volatility
+        FROM rollups_recent
+        WHERE listing_count >= ?
+        ORDER BY listing_count DESC
+        LIMIT ?
+    ),
+    picks AS (
+        SELECT e.ts, e.item_id, e.item_name, e.count, e.price, e.seller_name, e.time_left,
+               s.median, s.volatility, s.sample_size,
+               ROW_NUMBER() OVER (PARTITION BY e.item_id, e.item_name ORDER BY e.ts DESC) AS pick
+        FROM events e
+        JOIN stats s ON e.item_id = s.item_id AND e.item_name = s.item_name
+        WHERE e.type = 'listing' AND e.price IS NOT NULL
+        AND s.median > 0 AND e.price < s.median * 0.85
+    ),
+    scored AS (
+        SELECT *,
+               CAST(ROUND((1 - price / median) * 100) AS INTEGER) AS discount_pct,
+               median - price AS profit_potential,
+               MIN(100, sample_size) AS confidence,
+               MAX(0, 100 - volatility) AS stability
+        FROM picks
+        WHERE pick = 1
+    ),
+    ranked AS (
+        SELECT *,
+               CAST(ROUND(MIN(100, discount_pct * 1.5) * 0.4
+                          + stability * 0.3
+                          + confidence * 0.3) AS INTEGER) AS priority_score
+        FROM scored
+        WHERE discount_pct >= 15
     )
-    prices = [r[0] for r in cur.fetchall()]
-    
-    if not prices or len(prices) < 3:
-        return None
-    
-    sorted_prices = sorted(prices)
-    n = len(sorted_prices)
-    
-    q1_idx = n // 4
-    q3_idx = (3 * n) // 4
-    q1 = sorted_prices[q1_idx]
-    q3 = sorted_prices[q3_idx]
-    iqr = q3 - q1
-    
-    if iqr > 0:
-        lower_bound = max(0, q1 - 1.5 * iqr)
-        upper_bound = q3 + 1.5 * iqr
-        prices_filtered = [p for p in prices if lower_bound <= p <= upper_bound]
-    else:
-        prices_filtered = prices
-    
-    if not prices_filtered:
-        prices_filtered = prices
-    
-    median = statistics.median(prices_filtered)
-    mean = statistics.mean(prices_filtered)
-    
-    try:
-        stdev = statistics.stdev(prices_filtered) if len(prices_filtered) > 1 else 0
-    except:
-        stdev = 0
-    
-    volatility = (stdev / mean * 100) if mean > 0 else 0
-    
-    return {
-        "median": median,
-        "mean": mean,
-        "min": min(prices_filtered),
-        "max": max(prices_filtered),
-        "q1": q1,
-        "q3": q3,
-        "stdev": stdev,
-        "volatility": volatility,
-        "sample_size": len(prices)
-    }
+    SELECT item_id, COALESCE(item_name, item_id) AS item_name, count,
+           price AS current_price, median AS median_price,
+           discount_pct, profit_potential,
+           CASE WHEN price > 0 THEN CAST(ROUND(profit_potential / price * 100) AS INTEGER)
+                ELSE 0 END AS profit_margin_pct,
+           priority_score,
+           CAST(ROUND(confidence) AS INTEGER) AS confidence,
+           CAST(ROUND(stability) AS INTEGER) AS stability,
+           ROUND(volatility, 1) AS volatility,
+           sample_size, seller_name AS seller, time_left, ts
+    FROM ranked
+    WHERE priority_score >= 30
+    ORDER BY priority_score DESC
+    LIMIT ?
+"""
+
+
+def _load_recommendations(cur) -> List[Dict[str, Any]]:
+    """Recommendation rows, best priority first (max 50)"""
+    # Latest listing below 85% of median for the 200 most-listed items,
+    # scored as 40% discount, 30% price stability, 30% sample confidence
+    cur.execute(_SQL_RECOMMENDATIONS, (10, 200, 50))
+    return [dict(row) for row in cur.fetchall()]
 
 
 @app.route("/api/recommendations")
 def api_recommendations():
     """Smart purchase recommendations with priority scoring"""
-    conn = _get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT item_id, item_name, COUNT(*) as cnt FROM events 
-            WHERE type = 'listing' 
-            GROUP BY item_id, item_name 
-            HAVING cnt >= 10
-            ORDER BY cnt DESC
-            LIMIT 200
-            """
-        )
-        items = cur.fetchall()
-        recommendations: List[Dict[str, Any]] = []
-        
-        for item_row in items:
-            item_id, item_name = item_row[0], item_row[1]
-            stats = _get_item_stats(cur, item_id, item_name)
-            
-            if not stats or stats["median"] == 0:
-                continue
-            
-            median = stats["median"]
-            volatility = stats["volatility"]
-            sample_size = stats["sample_size"]
-            
-            cur.execute(
-                """
-                SELECT ts, count, price, seller_name, time_left
-                FROM events
-                WHERE item_id = ? AND item_name = ? AND price IS NOT NULL 
-                AND price < ? AND type = 'listing'
-                ORDER BY ts DESC
-                LIMIT 1
-                """,
-                (item_id, item_name, median * 0.85),
-            )
-            
-            listing = cur.fetchone()
-            if not listing:
-                continue
-            
-            ts, count, price, seller, time_left = listing
-            
-            discount_pct = round((1 - price / median) * 100)
-            if discount_pct < 15:
-                continue
-            
-            profit_potential = median - price
-            profit_margin_pct = (profit_potential / price * 100) if price > 0 else 0
-            
-            confidence_score = min(100, sample_size / 10 * 10)
-            stability_score = max(0, 100 - volatility)
-            discount_score = min(100, discount_pct * 1.5)
-            
-            priority_score = round(
-                (discount_score * 0.4) + 
-                (stability_score * 0.3) + 
-                (confidence_score * 0.3)
-            )
-            
-            if priority_score < 30:
-                continue
-            
-            recommendations.append({
-                "item_id": item_id,
-                "item_name": item_name or item_id,
-                "count": count,
-                "current_price": price,
-                "median_price": median,
-                "discount_pct": discount_pct,
-                "profit_potential": profit_potential,
-                "profit_margin_pct": round(profit_margin_pct),
-                "priority_score": priority_score,
-                "confidence": round(confidence_score),
-                "stability": round(stability_score),
-                "volatility": round(volatility, 1),
-                "sample_size": sample_size,
-                "seller": seller,
-                "time_left": time_left,
-                "ts": ts
-            })
-        
-        recommendations.sort(key=lambda x: x['priority_score'], reverse=True)
-        conn.close()
-        return jsonify({"status": "ok", "data": recommendations[:50]})
-    except Exception as e:
-        conn.close()
-        return jsonify({"status": "error", "message": str(e)}), 500
+    with _acquire() as conn:
+        try:
+            data = _cached("recommendations", conn, _load_recommendations)
+            return _json({"status": "ok", "data": data})
+        except Exception as e:
+            return _json({"status": "error", "message": str(e)}, 500)
+
+
+_SQL_UNDERVALUED = f"""
+    WITH stats AS (
+        SELECT item_id, item_name, sample_size, median, {_SQL_VOLATILITY} AS volatility
+        FROM rollups_recent
+        WHERE listing_count >= :min_count
+        ORDER BY listing_count DESC
+        LIMIT :items
+    ),
+    picks AS (
+        SELECT e.ts, e.item_id, e.item_name, e.count, e.price, e.seller_name, e.time_left,
+               s.median, s.volatility, s.sample_size,
+               ROW_NUMBER() OVER (PARTITION BY e.item_id, e.item_name ORDER BY e.price) AS pick
+        FROM events e
+        JOIN stats s ON e.item_id = s.item_id AND e.item_name = s.item_name
+        WHERE e.type = 'listing' AND e.price IS NOT NULL
+        AND s.median > 0 AND e.price < s.median * :threshold
+    )
+    SELECT ts, item_id, COALESCE(item_name, item_id) AS item_name, count, price,
+           seller_name AS seller, time_left, median,
+           median * :threshold AS threshold,
+           CAST(ROUND((1 - price / median) * 100) AS INTEGER) AS discount_pct,
+           median - price AS profit_potential,
+           sample_size,
+           ROUND(volatility, 1) AS volatility
+    FROM picks
+    WHERE pick <= 10
+    ORDER BY price / median ASC
+    LIMIT 100
+"""
+
+
+def _load_undervalued(cur) -> List[Dict[str, Any]]:
+    """Listings priced below 70% of their item's median (max 100)"""
+    # Up to 10 cheapest listings below threshold per item, deepest discounts first
+    cur.execute(_SQL_UNDERVALUED, {"min_count": 5, "items": 300, "threshold": 0.7})
+    return [dict(row) for row in cur.fetchall()]
 
 
 @app.route("/api/undervalued")
 def api_undervalued():
     """Current undervalued listings with enhanced data"""
-    conn = _get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT item_id, item_name, COUNT(*) as cnt FROM events 
-            WHERE type = 'listing' 
-            GROUP BY item_id, item_name 
-            HAVING cnt >= 5
-            ORDER BY cnt DESC
-            LIMIT 300
-            """
-        )
-        items = cur.fetchall()
-        findings: List[Dict[str, Any]] = []
-        threshold_factor = 0.7
-        
-        for item_row in items:
-            item_id, item_name = item_row[0], item_row[1]
-            stats = _get_item_stats(cur, item_id, item_name)
-            
-            if not stats or stats["median"] == 0:
-                continue
-            
-            median = stats["median"]
-            threshold = median * threshold_factor
-            
-            cur.execute(
-                """
-                SELECT ts, item_id, item_name, count, price, seller_name, time_left
-                FROM events
-                WHERE item_id = ? AND item_name = ? AND price IS NOT NULL AND price < ? AND type = 'listing'
-                ORDER BY price ASC
-                LIMIT 10
-                """,
-                (item_id, item_name, threshold),
-            )
-            
-            for listing_row in cur.fetchall():
-                price = listing_row[4]
-                discount_pct = round((1 - price / median) * 100)
-                profit = median - price
-                
-                findings.append({
-                    "ts": listing_row[0],
-                    "item_id": listing_row[1],
-                    "item_name": listing_row[2] or listing_row[1],
-                    "count": listing_row[3],
-                    "price": price,
-                    "seller": listing_row[5],
-                    "time_left": listing_row[6],
-                    "median": median,
-                    "threshold": threshold,
-                    "discount_pct": discount_pct,
-                    "profit_potential": profit,
-                    "sample_size": stats["sample_size"],
-                    "volatility": round(stats["volatility"], 1)
-                })
-        
-        findings.sort(key=lambda x: x['discount_pct'], reverse=True)
-        conn.close()
-        return jsonify({"status": "ok", "data": findings[:100]})
-    except Exception as e:
-        conn.close()
-        return jsonify({"status": "error", "message": str(e)}), 500
+    with _acquire() as conn:
+        try:
+            data = _cached("undervalued", conn, _load_undervalued)
+            return _json({"status": "ok", "data": data})
+        except Exception as e:
+            return _json({"status": "error", "message": str(e)}, 500)
+
+
+_SQL_MARKET_OVERVIEW = f"""
+    SELECT item_id, COALESCE(item_name, item_id) AS item_name,
+           listing_count AS trade_count, median, min, max,
+           ROUND({_SQL_VOLATILITY}, 1) AS volatility, sample_size
+    FROM rollups_recent
+    ORDER BY listing_count DESC
+    LIMIT 20
+"""
+
+
+def _load_market_overview(cur) -> List[Dict[str, Any]]:
+    """Price summary for the 20 most-listed items"""
+    cur.execute(_SQL_MARKET_OVERVIEW)
+    return [dict(row) for row in cur.fetchall()]
 
 
 @app.route("/api/market-overview")
 def api_market_overview():
     """Get top traded items with price info"""
-    conn = _get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT item_id, item_name, COUNT(*) as trade_count
-            FROM events
-            WHERE type = 'listing' AND price IS NOT NULL
-            GROUP BY item_id, item_name
-            ORDER BY trade_count DESC
-            LIMIT 20
-            """
-        )
-        items = cur.fetchall()
-        
-        market_data = []
-        for row in items:
-            item_id, item_name, trade_count = row[0], row[1], row[2]
-            stats = _get_item_stats(cur, item_id, item_name)
-            
-            if stats:
-                market_data.append({
-                    "item_id": item_id,
-                    "item_name": item_name or item_id,
-                    "trade_count": trade_count,
-                    "median": stats["median"],
-                    "min": stats["min"],
-                    "max": stats["max"],
-                    "volatility": round(stats["volatility"], 1),
-                    "sample_size": stats["sample_size"]
-                })
-        
-        conn.close()
-        return jsonify({"status": "ok", "data": market_data})
-    except Exception as e:
-        conn.close()
-        return jsonify({"status": "error", "message": str(e)}), 500
+    with _acquire() as conn:
+        try:
+            data = _cached("market-overview", conn, _load_market_overview)
+            return _json({"status": "ok", "data": data})
+        except Exception as e:
+            return _json({"status": "error", "message": str(e)}, 500)
+
+
+_SQL_TREND = """
+    SELECT date, item_id, item_name, median, p25, p75, count
+    FROM rollups_daily
+    WHERE item_id = ?
+    ORDER BY date ASC
+"""
 
 
 @app.route("/api/trend/<item_id>")
 def api_trend(item_id: str):
     """Price trend from rollups_daily for a given item_id"""
-    conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT date, item_id, item_name, median, p25, p75, count
-        FROM rollups_daily
-        WHERE item_id IS ?
-        ORDER BY date ASC
-        """,
-        (item_id,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    data = [dict(row) for row in rows]
-    return jsonify({"status": "ok", "data": data})
+    with _acquire() as conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_TREND, (item_id,))
+        rows = cur.fetchall()
+        data = [dict(row) for row in rows]
+        return _json({"status": "ok", "data": data})
+
+
+_SQL_STATS_COUNTERS = "SELECT key, value FROM stats_cache"
+_SQL_EVENTS_SINCE = "SELECT COUNT(*) FROM events WHERE last_seen > ?"
 
 
 @app.route("/api/stats")
 def api_stats():
     """Global stats from events table"""
-    conn = _get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("SELECT COUNT(*) FROM events")
-    total_events = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM events WHERE type = 'listing'")
-    total_listings = cur.fetchone()[0]
+    with _acquire() as conn:
+        cur = conn.cursor()
     
-    cur.execute("SELECT COUNT(*) FROM events WHERE type = 'transaction'")
-    total_transactions = cur.fetchone()[0]
+        # Totals come from the trigger-maintained counters instead of full scans
+        cur.execute(_SQL_STATS_COUNTERS)
+        counters = dict(cur.fetchall())
+        total_events = counters.get("total_events") or 0
+        total_listings = counters.get("total_listings") or 0
+        total_transactions = counters.get("total_transactions") or 0
+        unique_items = counters.get("unique_items") or 0
+        first_event = counters.get("min_ts")
+        last_event = counters.get("max_ts")
     
-    cur.execute("SELECT COUNT(DISTINCT item_id) FROM events")
-    unique_items = cur.fetchone()[0]
+        one_hour_ago = _now_millis() - (60 * 60 * 1000)
+        cur.execute(_SQL_EVENTS_SINCE, (one_hour_ago,))
+        events_last_hour = cur.fetchone()[0]
     
-    one_hour_ago = _now_millis() - (60 * 60 * 1000)
-    cur.execute("SELECT COUNT(*) FROM events WHERE ts > ?", (one_hour_ago,))
-    events_last_hour = cur.fetchone()[0]
+        data_span_hours = 0
+        if first_event and last_event:
+            data_span_hours = round((last_event - first_event) / (1000 * 60 * 60), 1)
     
-    cur.execute("SELECT MIN(ts), MAX(ts) FROM events")
-    time_range = cur.fetchone()
-    first_event = time_range[0]
-    last_event = time_range[1]
-    
-    data_span_hours = 0
-    if first_event and last_event:
-        data_span_hours = round((last_event - first_event) / (1000 * 60 * 60), 1)
-    
-    conn.close()
-    return jsonify({
-        "status": "ok",
-        "data": {
-            "total_events": total_events,
-            "total_listings": total_listings,
-            "total_transactions": total_transactions,
-            "unique_items": unique_items,
-            "events_last_hour": events_last_hour,
-            "data_span_hours": data_span_hours
-        },
-    })
+        return _json({
+            "status": "ok",
+            "data": {
+                "total_events": total_events,
+                "total_listings": total_listings,
+                "total_transactions": total_transactions,
+                "unique_items": unique_items,
+                "events_last_hour": events_last_hour,
+                "data_span_hours": data_span_hours
+            },
+        })
 
 
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "5000"))
-    app.run(host=host, port=port, debug=False)
+    # One thread per request; sqlite3 releases the GIL while a query runs and WAL
+    # lets readers proceed alongside the scanner, so slow scans don't serialize.
+    app.run(host=host, port=port, debug=False, threaded=True)
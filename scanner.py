@@ -1,14 +1,24 @@
 import os
 import sys
 import time
+import hashlib
 import json
+import random
 import sqlite3
-import statistics
 import configparser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from schema import init_db
 
 # Load .env file if present (for local development)
 try:
@@ -39,94 +49,76 @@ RAW_RETENTION_DAYS = int(_get_config("storage", "raw_retention_days", "7"))
 COMPACTION_INTERVAL = int(_get_config("storage", "compaction_interval_hours", "24")) * 3600
 
 _last_compaction = 0
+# Item ids written by this process (plus those on disk at startup), for the poll log line
+_seen_item_ids: Set[str] = set()
+
+# One keep-alive session for every API call: pages reuse pooled TCP/TLS
+# connections, and transient 5xx responses are retried with backoff
+# (requests already asks for gzip via its default Accept-Encoding).
+# 429/503 are left to _check_rate_limit so RateLimited owns Retry-After.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[500, 502, 504],
+            respect_retry_after_header=False,
+        ),
+    ),
+)
+# Per-poll page fetches run here in parallel, sized to the session's connection pool
+_FETCH_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ah-fetch")
 
 # Safety: never print or persist AUTH_KEY
 
 
-def _auth_headers() -> Dict[str, str]:
+@lru_cache(maxsize=1)
+def _auth_headers() -> Mapping[str, str]:
+    # Built once and shared read-only by every request (a missing key is not cached)
     if not AUTH_KEY:
         raise RuntimeError("DONUTSMP_AUTH_KEY not set. Set environment variable before running.")
-    return {"Authorization": f"Bearer {AUTH_KEY}", "Content-Type": "application/json"}
+    return MappingProxyType({"Authorization": f"Bearer {AUTH_KEY}", "Content-Type": "application/json"})
 
 
 def _now_millis() -> int:
-    return int(datetime.now(timezone.utc).timestamp() * 1000)
+    return time.time_ns() // 1_000_000
 
 
-def init_db(conn: sqlite3.Connection) -> None:
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS listings (
-            id TEXT PRIMARY KEY,
-            item_id TEXT,
-            item_name TEXT,
-            count INTEGER,
-            price REAL,
-            seller_name TEXT,
-            seller_uuid TEXT,
-            time_left INTEGER,
-            seen_at INTEGER
-        )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS prices (
-            id TEXT,
-            item_id TEXT,
-            item_name TEXT,
-            price REAL,
-            seen_at INTEGER
-        )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS transactions (
-            unixMillisDateSold INTEGER,
-            item_id TEXT,
-            item_name TEXT,
-            price REAL,
-            seller_name TEXT,
-            seller_uuid TEXT
-        )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT,
-            ts INTEGER,
-            item_id TEXT,
-            item_name TEXT,
-            price REAL,
-            seller_name TEXT,
-            seller_uuid TEXT,
-            count INTEGER,
-            time_left INTEGER
-        )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS rollups_daily (
-            date TEXT,
-            item_id TEXT,
-            item_name TEXT,
-            median REAL,
-            p25 REAL,
-            p75 REAL,
-            count INTEGER,
-            PRIMARY KEY (date, item_id, item_name)
-        )
-        """
-    )
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_item ON events(item_id, item_name)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_rollups_item ON rollups_daily(item_id, item_name)")
-    conn.commit()
+class RateLimited(RuntimeError):
+    """The API answered 429/503 with a Retry-After delay"""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Rate limited, retry after {retry_after:g}s")
+        self.retry_after = retry_after
+
+
+def _check_rate_limit(resp: requests.Response) -> None:
+    if resp.status_code not in (429, 503):
+        return
+    value = resp.headers.get("Retry-After")
+    if value is None:
+        return
+    try:
+        delay = float(value)
+    except ValueError:
+        # HTTP-date form
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return
+    raise RateLimited(max(0.0, delay))
+
+
+def _backoff_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retry `attempt` (1-based): the server's Retry-After
+    when rate limited, otherwise exponential backoff with jitter"""
+    if isinstance(error, RateLimited):
+        return error.retry_after
+    return min(60.0, 2 ** attempt + random.random())
 
 
 def fetch_listings(page: int, search: Optional[str] = None, sort: Optional[str] = None) -> Dict[str, Any]:
@@ -137,9 +129,10 @@ def fetch_listings(page: int, search: Optional[str] = None, sort: Optional[str]
     if sort:
         body["sort"] = sort
     try:
-        resp = requests.get(url, headers=_auth_headers(), json=(body or None), timeout=REQUEST_TIMEOUT)
+        resp = _SESSION.get(url, headers=_auth_headers(), json=(body or None), timeout=REQUEST_TIMEOUT)
     except requests.RequestException as e:
         raise RuntimeError(f"Request error for listings page {page}: {e}")
+    _check_rate_limit(resp)
     if resp.status_code == 401:
         time.sleep(2)
         raise PermissionError("Unauthorized: Check DONUTSMP_AUTH_KEY and header format.")
@@ -147,7 +140,7 @@ def fetch_listings(page: int, search: Optional[str] = None, sort: Optional[str]
         raise RuntimeError(f"Server error {resp.status_code}: {resp.text}")
     if resp.status_code != 200:
         raise RuntimeError(f"Unexpected status {resp.status_code}: {resp.text}")
-    return resp.json()
+    return orjson.loads(resp.content)
 
 
 def fetch_transactions(page: int) -> Dict[str, Any]:
@@ -155,9 +148,10 @@ def fetch_transactions(page: int) -> Dict[str, Any]:
         raise ValueError("Transaction page must be between 1 and 10")
     url = f"{BASE_URL}/v1/auction/transactions/{page}"
     try:
-        resp = requests.get(url, headers=_auth_headers(), timeout=REQUEST_TIMEOUT)
+        resp = _SESSION.get(url, headers=_auth_headers(), timeout=REQUEST_TIMEOUT)
     except requests.RequestException as e:
         raise RuntimeError(f"Request error for transactions page {page}: {e}")
+    _check_rate_limit(resp)
     if resp.status_code == 401:
         time.sleep(2)
         raise PermissionError("Unauthorized: Check DONUTSMP_AUTH_KEY and header format.")
@@ -165,172 +159,202 @@ def fetch_transactions(page: int) -> Dict[str, Any]:
         raise RuntimeError(f"Server error {resp.status_code}: {resp.text}")
     if resp.status_code != 200:
         raise RuntimeError(f"Unexpected status {resp.status_code}: {resp.text}")
-    return resp.json()
+    return orjson.loads(resp.content)
 
 
-def _item_display(item: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
-    name = item.get("display_name")
-    item_id = item.get("id")
-    if not name:
-        # Fallback to id if name is missing
-        name = item_id
-    return item_id, name
+# A row seen again (same content_hash) keeps its first-seen ts; only last_seen
+# and the shrinking time_left are refreshed
+_SQL_INSERT_EVENT = """
+    INSERT INTO events
+        (type, ts, item_id, item_name, price, seller_name, seller_uuid, count, time_left, content_hash,
+         last_seen)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?2)
+    ON CONFLICT (content_hash) WHERE content_hash IS NOT NULL
+    DO UPDATE SET last_seen = excluded.last_seen, time_left = excluded.time_left
+"""
 
 
-def store_listings(conn: sqlite3.Connection, response: Dict[str, Any]) -> int:
-    result = response.get("result", [])
+def _content_hash(*fields: Any) -> int:
+    """Signed 64-bit digest of an event's identity. hash() is salted per process,
+    so it could not dedupe against rows written before a restart."""
+    digest = hashlib.blake2b(repr(fields).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _expiry_minute(ts: int, time_left: Optional[int]) -> Optional[int]:
+    """Minute a listing expires. time_left shrinks between polls but ts + time_left
+    stays put; like the dashboard, values over 1e6 are taken as milliseconds."""
+    if time_left is None:
+        return None
+    left_ms = time_left if time_left > 1_000_000 else time_left * 1000
+    return (ts + left_ms) // 60_000
+
+
+def _insert_events(conn: sqlite3.Connection, rows: List[Tuple[Any, ...]], commit: bool = True) -> int:
+    """Insert event rows with one prepared statement and return how many were new
+    (repeats only refresh last_seen). With commit=False the caller owns the transaction."""
     cur = conn.cursor()
-    inserted = 0
+    if commit:
+        cur.execute("BEGIN IMMEDIATE")
+    try:
+        # rowcount includes upserted repeats, and those also use up ids, so count
+        # the rows that landed past the previous highest id instead
+        last_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        cur.executemany(_SQL_INSERT_EVENT, rows)
+        inserted = cur.execute("SELECT COUNT(*) FROM events WHERE id > ?", (last_id,)).fetchone()[0]
+        if commit:
+            conn.commit()
+    except Exception:
+        if commit:
+            conn.rollback()
+        raise
+    _seen_item_ids.update(row[2] for row in rows if row[2])
+    return inserted
+
+
+# Both store loops key items the same way, inline to skip a call per row: a missing
+# id is stored as '' rather than NULL so item lookups can use =, and a missing
+# display name falls back to the id.
+def store_listings(conn: sqlite3.Connection, response: Dict[str, Any], commit: bool = True) -> int:
+    result = response.get("result", [])
     ts = _now_millis()
+    rows = []
     for entry in result:
         item = entry.get("item", {})
         price = entry.get("price")
         seller = entry.get("seller", {})
         time_left = entry.get("time_left")
-        item_id, item_name = _item_display(item)
+        item_id = item.get("id") or ""
+        item_name = item.get("display_name") or item_id
+        price = float(price) if price is not None else None
+        seller_uuid = seller.get("uuid")
         count = item.get("count")
-        cur.execute(
-            """
-            INSERT INTO events (type, ts, item_id, item_name, price, seller_name, seller_uuid, count, time_left)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+        time_left = int(time_left) if time_left is not None else None
+        expiry = _expiry_minute(ts, time_left)
+        rows.append(
             (
                 "listing",
                 ts,
                 item_id,
                 item_name,
-                float(price) if price is not None else None,
+                price,
                 seller.get("name"),
-                seller.get("uuid"),
+                seller_uuid,
                 count,
-                int(time_left) if time_left is not None else None,
-            ),
+                time_left,
+                _content_hash("listing", item_id, item_name, price, seller_uuid, count, expiry)
+                if expiry is not None else None,
+            )
         )
-        inserted += 1
-    conn.commit()
-    return inserted
+    return _insert_events(conn, rows, commit)
 
 
-def store_transactions(conn: sqlite3.Connection, response: Dict[str, Any]) -> int:
+def store_transactions(conn: sqlite3.Connection, response: Dict[str, Any], commit: bool = True) -> int:
     result = response.get("result", [])
-    cur = conn.cursor()
-    inserted = 0
     ts = _now_millis()
+    rows = []
     for entry in result:
         item = entry.get("item", {})
         price = entry.get("price")
         seller = entry.get("seller", {})
         sold_at = entry.get("unixMillisDateSold")
-        item_id, item_name = _item_display(item)
-        cur.execute(
-            """
-            INSERT INTO events (type, ts, item_id, item_name, price, seller_name, seller_uuid, count, time_left)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+        item_id = item.get("id") or ""
+        item_name = item.get("display_name") or item_id
+        price = float(price) if price is not None else None
+        seller_uuid = seller.get("uuid")
+        rows.append(
             (
                 "transaction",
                 ts,
                 item_id,
                 item_name,
-                float(price) if price is not None else None,
+                price,
                 seller.get("name"),
-                seller.get("uuid"),
+                seller_uuid,
                 None,
                 None,
-            ),
+                _content_hash("transaction", item_id, item_name, price, seller_uuid, sold_at)
+                if sold_at is not None else None,
+            )
         )
-        inserted += 1
-    conn.commit()
-    return inserted
-
-
-def compute_stats(conn: sqlite3.Connection, item_key: Tuple[Optional[str], Optional[str]]) -> Dict[str, Any]:
-    item_id, item_name = item_key
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT price FROM prices WHERE item_id IS ? AND item_name IS ? AND price IS NOT NULL
-        """,
-        (item_id, item_name),
-    )
-    prices = [row[0] for row in cur.fetchall()]
-    if not prices:
-        return {"count": 0}
-    prices_sorted = sorted(prices)
-    median_price = statistics.median(prices_sorted)
-    # robust stddev: use population stdev if at least 2 values
-    stddev = statistics.pstdev(prices_sorted) if len(prices_sorted) > 1 else 0.0
-    p25 = prices_sorted[max(0, (len(prices_sorted) * 25) // 100 - 1)]
-    p75 = prices_sorted[min(len(prices_sorted) - 1, (len(prices_sorted) * 75) // 100 - 1)]
-    return {
-        "count": len(prices_sorted),
-        "median": median_price,
-        "stddev": stddev,
-        "p25": p25,
-        "p75": p75,
-    }
+    return _insert_events(conn, rows, commit)
 
 
 def detect_undervalued(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
     cur = conn.cursor()
+    # Per-item median of prices (mean of the middle pair for even counts), then
+    # every listing under median * threshold, all in one statement
     cur.execute(
         """
-        SELECT item_id, item_name FROM prices GROUP BY item_id, item_name
-        """
-    )
-    items = cur.fetchall()
-    findings: List[Dict[str, Any]] = []
-    for item_id, item_name in items:
-        stats = compute_stats(conn, (item_id, item_name))
-        if not stats.get("count"):
-            continue
-        median_price = stats.get("median")
-        if median_price is None or median_price == 0:
-            continue
-        threshold_price = median_price * UNDERPRICE_THRESHOLD
-        cur.execute(
-            """
-            SELECT id, price, seller_name, seller_uuid, seen_at FROM listings
-            WHERE item_id IS ? AND item_name IS ? AND price IS NOT NULL AND price < ?
-            ORDER BY price ASC
-            """,
-            (item_id, item_name, threshold_price),
+        WITH ranked AS (
+            SELECT item_id, item_name, price,
+                   ROW_NUMBER() OVER (PARTITION BY item_id, item_name ORDER BY price) AS rn,
+                   COUNT(*) OVER (PARTITION BY item_id, item_name) AS cnt
+            FROM prices
+            WHERE price IS NOT NULL
+        ),
+        medians AS (
+            SELECT item_id, item_name, AVG(price) AS median
+            FROM ranked
+            WHERE rn IN ((cnt + 1) / 2, (cnt + 2) / 2)
+            GROUP BY item_id, item_name
         )
-        rows = cur.fetchall()
-        for row in rows:
-            findings.append(
-                {
-                    "id": row[0],
-                    "item_id": item_id,
-                    "item_name": item_name,
-                    "price": row[1],
-                    "seller_name": row[2],
-                    "seller_uuid": row[3],
-                    "seen_at": row[4],
-                    "median": median_price,
-                    "threshold": threshold_price,
-                }
-            )
-    return findings
+        SELECT l.id, m.item_id, m.item_name, l.price, l.seller_name, l.seller_uuid, l.seen_at,
+               m.median, m.median * ? AS threshold
+        FROM medians m
+        JOIN listings l ON l.item_id = m.item_id AND l.item_name = m.item_name
+        WHERE m.median != 0 AND l.price IS NOT NULL AND l.price < m.median * ?
+        ORDER BY m.item_id, m.item_name, l.price
+        """,
+        (UNDERPRICE_THRESHOLD, UNDERPRICE_THRESHOLD),
+    )
+    # The SELECT list already uses the finding keys as column names
+    columns = [d[0] for d in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
 
 
 def poll_once(conn: sqlite3.Connection, pages: int, search: Optional[str], sort: Optional[str]) -> Tuple[int, int]:
-    listings_inserted = 0
-    transactions_inserted = 0
-    for p in range(1, pages + 1):
+    listing_futures = [
+        (p, _FETCH_POOL.submit(fetch_listings, page=p, search=search, sort=sort))
+        for p in range(1, pages + 1)
+    ]
+    transaction_futures = [
+        (p, _FETCH_POOL.submit(fetch_transactions, page=p))
+        for p in range(1, min(MAX_TRANSACTIONS_PAGES, pages) + 1)
+    ]
+    listing_pages = []
+    for p, future in listing_futures:
         try:
-            data = fetch_listings(page=p, search=search, sort=sort)
-            count = store_listings(conn, data)
-            listings_inserted += count
+            listing_pages.append((p, future.result()))
         except Exception as e:
             print(f"[WARN] Listings page {p} error: {e}")
-    for p in range(1, min(MAX_TRANSACTIONS_PAGES, pages) + 1):
+    transaction_pages = []
+    for p, future in transaction_futures:
         try:
-            data = fetch_transactions(page=p)
-            count = store_transactions(conn, data)
-            transactions_inserted += count
+            transaction_pages.append((p, future.result()))
         except Exception as e:
             print(f"[WARN] Transactions page {p} error: {e}")
+
+    # Fetch first, then write every page in one transaction: a single commit per
+    # poll, and the write lock is never held across network calls
+    listings_inserted = 0
+    transactions_inserted = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for p, data in listing_pages:
+            try:
+                listings_inserted += store_listings(conn, data, commit=False)
+            except Exception as e:
+                print(f"[WARN] Listings page {p} error: {e}")
+        for p, data in transaction_pages:
+            try:
+                transactions_inserted += store_transactions(conn, data, commit=False)
+            except Exception as e:
+                print(f"[WARN] Transactions page {p} error: {e}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     return listings_inserted, transactions_inserted
 
 
@@ -346,7 +370,7 @@ def _get_listing_details(conn: sqlite3.Connection, listing_id: str) -> Dict[str,
         """
         SELECT item_id, item_name, count, time_left
         FROM listings
-        WHERE id IS ?
+        WHERE id = ?
         """,
         (listing_id,),
     )
@@ -434,44 +458,52 @@ def compact_old_data(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
     now = _now_millis()
     cutoff = now - (RAW_RETENTION_DAYS * 86400 * 1000)
-    
-    # Compute daily rollups for old data
-    cur.execute(
-        """
-        SELECT date(ts / 1000, 'unixepoch') as date, item_id, item_name
-        FROM events
-        WHERE ts < ? AND type = 'listing'
-        GROUP BY date, item_id, item_name
-        """,
-        (cutoff,),
-    )
-    groups = cur.fetchall()
-    for date_str, item_id, item_name in groups:
+    # Compact whole UTC days only, so a day's rollup is never rebuilt from a partial day
+    cutoff -= cutoff % (86400 * 1000)
+
+    # Daily median/p25/p75 per item for old listings, computed and written in one
+    # statement; percentiles interpolate linearly between ranks like np.percentile
+    cur.execute("BEGIN IMMEDIATE")
+    try:
         cur.execute(
             """
-            SELECT price FROM events
-            WHERE date(ts / 1000, 'unixepoch') = ? AND item_id IS ? AND item_name IS ? AND price IS NOT NULL AND type = 'listing'
+            INSERT OR REPLACE INTO rollups_daily (date, item_id, item_name, median, p25, p75, count)
+            WITH ranked AS (
+                SELECT date(ts / 1000, 'unixepoch') AS date, item_id, item_name, price,
+                       ROW_NUMBER() OVER (PARTITION BY date(ts / 1000, 'unixepoch'), item_id, item_name
+                                          ORDER BY price) AS rn,
+                       COUNT(*) OVER (PARTITION BY date(ts / 1000, 'unixepoch'), item_id, item_name) AS cnt
+                FROM events
+                WHERE ts < ? AND type = 'listing' AND price IS NOT NULL
+            ),
+            picks AS (
+                SELECT date, item_id, item_name, cnt,
+                       AVG(CASE WHEN rn IN ((cnt + 1) / 2, (cnt + 2) / 2) THEN price END) AS median,
+                       MAX(CASE WHEN rn = (cnt - 1) / 4 + 1 THEN price END) AS p25_lo,
+                       MAX(CASE WHEN rn = (cnt - 1) / 4 + 2 THEN price END) AS p25_hi,
+                       MAX(CASE WHEN rn = 3 * (cnt - 1) / 4 + 1 THEN price END) AS p75_lo,
+                       MAX(CASE WHEN rn = 3 * (cnt - 1) / 4 + 2 THEN price END) AS p75_hi
+                FROM ranked
+                GROUP BY date, item_id, item_name
+            )
+            SELECT date, item_id, item_name, median,
+                   p25_lo + ((cnt - 1) % 4) * 0.25 * (COALESCE(p25_hi, p25_lo) - p25_lo),
+                   p75_lo + ((3 * (cnt - 1)) % 4) * 0.25 * (COALESCE(p75_hi, p75_lo) - p75_lo),
+                   cnt
+            FROM picks
             """,
-            (date_str, item_id, item_name),
+            (cutoff,),
         )
-        prices = [row[0] for row in cur.fetchall()]
-        if prices:
-            prices_sorted = sorted(prices)
-            median = statistics.median(prices_sorted)
-            p25 = prices_sorted[max(0, len(prices_sorted) * 25 // 100 - 1)]
-            p75 = prices_sorted[min(len(prices_sorted) - 1, len(prices_sorted) * 75 // 100 - 1)]
-            cur.execute(
-                """
-                INSERT OR REPLACE INTO rollups_daily (date, item_id, item_name, median, p25, p75, count)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (date_str, item_id, item_name, median, p25, p75, len(prices)),
-            )
-    
-    # Delete old events
-    cur.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
-    cur.execute("DELETE FROM prices WHERE seen_at < ?", (cutoff,))
-    conn.commit()
+
+        # Delete old events
+        cur.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    # The bulk delete skews the planner statistics; optimize re-analyzes what changed
+    cur.execute("PRAGMA analysis_limit=1000")
+    cur.execute("PRAGMA optimize")
     print(f"Compaction complete: removed events older than {RAW_RETENTION_DAYS} days")
 
 
@@ -479,83 +511,115 @@ def full_scan_ah(conn: sqlite3.Connection, search: Optional[str], sort: Optional
     """Scan ALL pages of the AH until no more results, with retry logic"""
     listings_total = 0
     transactions_total = 0
-    page = 1
     consecutive_empty = 0
     max_empty_pages = 3  # Stop after 3 empty pages in a row
-    retry_count = 0
     max_retries = 3
-    
+    workers = 8  # Pages fetched concurrently; writes stay on this thread's connection
+
+    def fetch_page(page: int) -> Optional[Dict[str, Any]]:
+        for retry in range(1, max_retries + 2):
+            try:
+                return fetch_listings(page=page, search=search, sort=sort)
+            except Exception as e:
+                if retry > max_retries:
+                    print(f"[ERROR] Page {page}: Max retries exceeded ({max_retries}). {e}")
+                    return None
+                backoff = _backoff_delay(e, retry)
+                print(f"[WARN] Page {page}: {e} (retry {retry}/{max_retries}, waiting {backoff:.1f}s)")
+                time.sleep(backoff)
+
+    def fetch_transactions_page(page: int) -> Optional[Dict[str, Any]]:
+        for retry in range(1, max_retries + 2):
+            try:
+                return fetch_transactions(page=page)
+            except Exception as e:
+                if retry > max_retries:
+                    print(f"[ERROR] Transactions page {page}: Max retries exceeded. {e}")
+                    return None
+                backoff = _backoff_delay(e, retry)
+                print(f"[WARN] Transactions page {page}: {e} (retry {retry}/{max_retries}, waiting {backoff:.1f}s)")
+                time.sleep(backoff)
+
     print(f"\n{'='*90}")
     print(f"INITIAL FULL AH SCAN - Fetching all pages until empty...")
     print(f"{'='*90}\n")
-    
-    while consecutive_empty < max_empty_pages:
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        # Keep a window of pages in flight but consume them in page order, so
+        # the consecutive-empty stop condition sees pages as a sequential scan would
+        pending = {p: ex.submit(fetch_page, p) for p in range(1, workers + 1)}
+        page = 1
         try:
-            ts_iso = datetime.now(timezone.utc).isoformat()
-            data = fetch_listings(page=page, search=search, sort=sort)
-            result = data.get("result", [])
-            
-            if not result:
-                consecutive_empty += 1
-                print(f"[{ts_iso}] Page {page}: Empty (consecutive empty: {consecutive_empty}/{max_empty_pages})")
+            while consecutive_empty < max_empty_pages:
+                future = pending.pop(page, None) or ex.submit(fetch_page, page)
+                data = future.result()
+                ts_iso = datetime.now(timezone.utc).isoformat()
+                if data is None:
+                    consecutive_empty += 1
+                elif not data.get("result", []):
+                    consecutive_empty += 1
+                    print(f"[{ts_iso}] Page {page}: Empty (consecutive empty: {consecutive_empty}/{max_empty_pages})")
+                else:
+                    try:
+                        count = store_listings(conn, data)
+                    except Exception as e:
+                        print(f"[ERROR] Page {page}: {e}")
+                        consecutive_empty += 1
+                    else:
+                        consecutive_empty = 0
+                        listings_total += count
+                        print(f"[{ts_iso}] Page {page}: Scanned {count} listings (total: {listings_total})")
                 page += 1
-                retry_count = 0  # Reset retry on success
-                continue
-            
-            consecutive_empty = 0
-            count = store_listings(conn, data)
-            listings_total += count
-            print(f"[{ts_iso}] Page {page}: Scanned {count} listings (total: {listings_total})")
-            page += 1
-            retry_count = 0  # Reset retry on success
-            
+                # Read ahead only while pages have data; after an empty page the
+                # scan goes one page at a time so it stops close to the end
+                if consecutive_empty == 0:
+                    for p in range(page, page + workers):
+                        if p not in pending:
+                            pending[p] = ex.submit(fetch_page, p)
         except KeyboardInterrupt:
             print(f"\n[!] Scan interrupted by user. Partial scan: {listings_total} listings")
             raise
-        except Exception as e:
-            retry_count += 1
-            if retry_count > max_retries:
-                print(f"[ERROR] Page {page}: Max retries exceeded ({max_retries}). {e}")
-                consecutive_empty += 1
-                page += 1
-                retry_count = 0
-            else:
-                backoff = 3 + (retry_count * 2)  # 5s, 7s, 9s
-                print(f"[WARN] Page {page}: {e} (retry {retry_count}/{max_retries}, waiting {backoff}s)")
-                time.sleep(backoff)
-                # Don't increment page; retry same page
-    
-    # Also scan all transaction pages (with retries)
-    print(f"\n[*] Scanning transaction history (pages 1-10)...")
-    for p in range(1, MAX_TRANSACTIONS_PAGES + 1):
-        retry = 0
-        while retry <= max_retries:
+        finally:
+            # Drop the read-ahead pages past the end of the auction house
+            for future in pending.values():
+                future.cancel()
+
+        # Also scan all transaction pages (with retries)
+        print(f"\n[*] Scanning transaction history (pages 1-10)...")
+        pages = range(1, MAX_TRANSACTIONS_PAGES + 1)
+        for p, data in zip(pages, ex.map(fetch_transactions_page, pages)):
+            if data is None:
+                continue
             try:
-                data = fetch_transactions(page=p)
                 count = store_transactions(conn, data)
-                transactions_total += count
-                ts_iso = datetime.now(timezone.utc).isoformat()
-                print(f"[{ts_iso}] Transactions page {p}: {count} (total: {transactions_total})")
-                break  # Success, move to next page
             except Exception as e:
-                retry += 1
-                if retry > max_retries:
-                    print(f"[ERROR] Transactions page {p}: Max retries exceeded. {e}")
-                    break
-                else:
-                    print(f"[WARN] Transactions page {p}: {e} (retry {retry}/{max_retries})")
-                    time.sleep(2)
-    
+                print(f"[ERROR] Transactions page {p}: {e}")
+                continue
+            transactions_total += count
+            ts_iso = datetime.now(timezone.utc).isoformat()
+            print(f"[{ts_iso}] Transactions page {p}: {count} (total: {transactions_total})")
+
     print(f"\n{'='*90}")
     print(f"FULL SCAN COMPLETE: {listings_total} listings + {transactions_total} transactions")
     print(f"{'='*90}\n")
-    
+
     return listings_total, transactions_total
 
 
+def _count_events(conn: sqlite3.Connection) -> int:
+    """Total events on disk; also reloads _seen_item_ids. Run at startup and after
+    compaction only, the poll loop keeps both current from its own inserts."""
+    cur = conn.cursor()
+    total = cur.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    _seen_item_ids.clear()
+    _seen_item_ids.update(row[0] for row in cur.execute("SELECT DISTINCT item_id FROM events WHERE item_id != ''"))
+    return total
+
+
 def run_poll_loop(pages: int, interval_sec: int, search: Optional[str], sort: Optional[str]) -> None:
     global _last_compaction
-    conn = sqlite3.connect(DB_PATH)
+    # Every write opens its own BEGIN, so let sqlite3 skip its implicit transactions
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, cached_statements=256)
     init_db(conn)
     start_ts = datetime.now(timezone.utc).isoformat()
     print(f"\n{'='*90}")
@@ -590,6 +654,7 @@ def run_poll_loop(pages: int, interval_sec: int, search: Optional[str], sort: Op
         print(f"[WARN] Initial scan skipped: {e}. Starting polling anyway.\n")
     
     
+    total_events = _count_events(conn)
     poll_count = 0
     while True:
         start = time.time()
@@ -597,11 +662,8 @@ def run_poll_loop(pages: int, interval_sec: int, search: Optional[str], sort: Op
         try:
             ts_iso = datetime.now(timezone.utc).isoformat()
             l_ins, t_ins = poll_once(conn, pages, search, sort)
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM events")
-            total_events = cur.fetchone()[0]
-            cur.execute("SELECT COUNT(DISTINCT item_id) FROM events")
-            unique_items = cur.fetchone()[0]
+            total_events += l_ins + t_ins
+            unique_items = len(_seen_item_ids)
             print(f"[{ts_iso}] Poll #{poll_count:05d} | +{l_ins:4d} listings | +{t_ins:4d} transactions | Total: {total_events:7d} events | {unique_items:3d} unique items")
             # Run compaction if interval passed
             if time.time() - _last_compaction > COMPACTION_INTERVAL:
@@ -609,6 +671,7 @@ def run_poll_loop(pages: int, interval_sec: int, search: Optional[str], sort: Op
                 print(f"[{comp_ts}] ► Running data compaction...")
                 compact_old_data(conn)
                 _last_compaction = time.time()
+                total_events = _count_events(conn)
         except PermissionError as e:
             print(f"[ERROR] {str(e)}")
             time.sleep(5)
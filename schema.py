@@ -0,0 +1,146 @@
+import sqlite3
+
+# Tables and migrations shared by scanner.py and api.py. Kept free of import-time
+# side effects so the API does not load the scanner's config, session or fetch pool.
+
+
+def init_db(conn: sqlite3.Connection) -> None:
+    """Create the shared schema in a single transaction"""
+    cur = conn.cursor()
+    # WAL lets the API read while we write; NORMAL syncs only at checkpoints
+    mode = cur.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    if mode.lower() != "wal":
+        print(f"[WARN] SQLite journal_mode is {mode}, expected wal")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.execute("PRAGMA cache_size=-65536")
+    cur.execute("PRAGMA busy_timeout=5000")
+    # Per connection: the writer checkpoints every 10000 pages instead of every 1000
+    cur.execute("PRAGMA wal_autocheckpoint=10000")
+    cur.execute("BEGIN")
+    try:
+        _create_tables(cur)
+        _normalize_item_keys(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _normalize_item_keys(cur: sqlite3.Cursor) -> None:
+    """One-time migration: NULL item ids/names become '' so lookups can use ="""
+    if cur.execute("PRAGMA user_version").fetchone()[0] >= 1:
+        return
+    for table in ("events", "listings", "rollups_daily"):
+        # INSERT OR REPLACE never matched NULL keys, so re-compacting a day left one
+        # rollups_daily row per run; OR REPLACE keeps the last of those duplicates
+        verb = "UPDATE OR REPLACE" if table == "rollups_daily" else "UPDATE"
+        cur.execute(
+            f"""
+            {verb} {table} SET item_id = COALESCE(item_id, ''), item_name = COALESCE(item_name, '')
+            WHERE item_id IS NULL OR item_name IS NULL
+            """
+        )
+    cur.execute("PRAGMA user_version = 1")
+
+
+def _create_tables(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS listings (
+            id TEXT PRIMARY KEY,
+            item_id TEXT,
+            item_name TEXT,
+            count INTEGER,
+            price REAL,
+            seller_name TEXT,
+            seller_uuid TEXT,
+            time_left INTEGER,
+            seen_at INTEGER
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            unixMillisDateSold INTEGER,
+            item_id TEXT,
+            item_name TEXT,
+            price REAL,
+            seller_name TEXT,
+            seller_uuid TEXT
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT,
+            ts INTEGER,
+            item_id TEXT,
+            item_name TEXT,
+            price REAL,
+            seller_name TEXT,
+            seller_uuid TEXT,
+            count INTEGER,
+            time_left INTEGER,
+            content_hash INTEGER,
+            last_seen INTEGER
+        )
+        """
+    )
+    # Databases created before listing dedupe lack content_hash and last_seen
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(events)")}
+    if "content_hash" not in columns:
+        cur.execute("ALTER TABLE events ADD COLUMN content_hash INTEGER")
+    if "last_seen" not in columns:
+        cur.execute("ALTER TABLE events ADD COLUMN last_seen INTEGER")
+        cur.execute("UPDATE events SET last_seen = ts")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rollups_daily (
+            date TEXT,
+            item_id TEXT,
+            item_name TEXT,
+            median REAL,
+            p25 REAL,
+            p75 REAL,
+            count INTEGER,
+            PRIMARY KEY (date, item_id, item_name)
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_item ON events(item_id, item_name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rollups_item ON rollups_daily(item_id, item_name)")
+    # prices used to be a table nothing wrote to; it is now a view over listing
+    # events. An old, empty prices table is dropped so the view can take its name.
+    row = cur.execute("SELECT type FROM sqlite_master WHERE name = 'prices'").fetchone()
+    if row and row[0] == "table":
+        if cur.execute("SELECT 1 FROM prices LIMIT 1").fetchone():
+            print("[WARN] prices table is not empty; leaving it in place of the prices view")
+        else:
+            cur.execute("DROP TABLE prices")
+    cur.execute(
+        """
+        CREATE VIEW IF NOT EXISTS prices AS
+        SELECT id, item_id, item_name, price, ts AS seen_at
+        FROM events
+        WHERE type = 'listing' AND price IS NOT NULL
+        """
+    )
+    # Covers detect_undervalued's per-item listing scan
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_listings_item_price ON listings(item_id, item_name, price)")
+    # Re-polled pages repeat listings/sales; the upsert keeps one row per content_hash
+    cur.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_content_hash
+        ON events(content_hash) WHERE content_hash IS NOT NULL
+        """
+    )
+    # compact_old_data and the API's recent-event queries filter on type + ts
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events(type, ts)")
+    # The API's live feed and last-hour count filter on when an event was last polled
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_last_seen ON events(last_seen)")